@@ -1,31 +1,54 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, List, Optional, Any, Type, Union
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime, timezone
+from typing import Callable, ClassVar, Dict, Iterator, List, Optional, Any, Tuple, Type, Union
 from uuid import UUID, uuid4
 from enum import Enum
+from functools import lru_cache
+import bisect
 import json
-from copy import deepcopy
+import time
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # numeric kernels run as plain Python
+    def njit(**options):
+        return lambda func: func
 
 
 # Event Base Classes
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Event:
     """Base event class for all domain events"""
+    # Set to the class name for every subclass by __init_subclass__
+    event_type: ClassVar[str] = "Event"
     event_id: UUID = field(default_factory=uuid4)
     aggregate_id: UUID = field(default=None)
-    event_type: str = field(init=False)
     version: int = 0
-    timestamp: datetime = field(default_factory=datetime.utcnow)
+    # Nanoseconds since the epoch (UTC); ints keep ordering comparisons cheap
+    timestamp: int = field(default_factory=time.time_ns)
     metadata: Dict[str, Any] = field(default_factory=dict)
     
-    def __post_init__(self):
-        if not hasattr(self, 'event_type'):
-            self.event_type = self.__class__.__name__
+    @property
+    def timestamp_dt(self) -> datetime:
+        """The event timestamp as a timezone-aware UTC datetime"""
+        return datetime.fromtimestamp(self.timestamp / 1e9, tz=timezone.utc)
+    
+    def __init_subclass__(cls, **kwargs):
+        # slots=True rebuilds the class, so zero-argument super() would bind the original
+        super(Event, cls).__init_subclass__(**kwargs)
+        cls.event_type = cls.__name__
 
 
 # Order Domain Events
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OrderCreated(Event):
     customer_id: UUID = None
     items: List[Dict[str, Any]] = field(default_factory=list)
@@ -33,7 +56,7 @@ class OrderCreated(Event):
     currency: str = "USD"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OrderItemAdded(Event):
     product_id: UUID = None
     quantity: int = 0
@@ -41,32 +64,97 @@ class OrderItemAdded(Event):
     item_name: str = ""
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OrderItemRemoved(Event):
     product_id: UUID = None
     quantity: int = 0
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OrderShipped(Event):
     shipping_address: Dict[str, str] = field(default_factory=dict)
     tracking_number: str = ""
     carrier: str = ""
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class OrderCancelled(Event):
     reason: str = ""
     refund_amount: float = 0.0
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PaymentProcessed(Event):
     payment_method: str = ""
     amount: float = 0.0
     transaction_id: str = ""
 
 
+# Event type name -> event class, used to rehydrate serialized events
+_EVENT_CLASSES: Dict[str, Type[Event]] = {
+    cls.__name__: cls
+    for cls in (
+        OrderCreated,
+        OrderItemAdded,
+        OrderItemRemoved,
+        OrderShipped,
+        OrderCancelled,
+        PaymentProcessed,
+    )
+}
+
+# Fields every event carries, serialized outside the event payload
+_EVENT_METADATA_FIELDS = frozenset(
+    ['event_id', 'aggregate_id', 'event_type', 'version', 'timestamp', 'metadata']
+)
+
+
+def _payload_fields(cls: Type[Event]) -> Tuple[str, ...]:
+    """Names of an event class's own payload fields, in declaration order"""
+    return tuple(
+        event_field.name
+        for event_field in fields(cls)
+        if event_field.name not in _EVENT_METADATA_FIELDS
+    )
+
+
+# Event class -> payload field names, so serialization skips the per-call field walk
+_DATA_FIELDS: Dict[Type[Event], Tuple[str, ...]] = {
+    cls: _payload_fields(cls) for cls in _EVENT_CLASSES.values()
+}
+
+# Event class -> payload fields declared as UUIDs, restored on deserialization
+_UUID_FIELDS: Dict[Type[Event], Tuple[str, ...]] = {
+    cls: tuple(
+        event_field.name
+        for event_field in fields(cls)
+        if event_field.type is UUID and event_field.name in _DATA_FIELDS[cls]
+    )
+    for cls in _EVENT_CLASSES.values()
+}
+
+# Event class -> small integer opcode, used to encode replay traces
+_EVENT_OPCODES: Dict[Type[Event], int] = {
+    cls: opcode for opcode, cls in enumerate(_EVENT_CLASSES.values())
+}
+_OP_ITEM_ADDED = _EVENT_OPCODES[OrderItemAdded]
+_OP_ITEM_REMOVED = _EVENT_OPCODES[OrderItemRemoved]
+# Shared by every event class defined outside this module; dispatch tables
+# stop short of it, so such events are routed through handle_event
+_OP_OTHER = len(_EVENT_OPCODES)
+
+
+def _dispatch_table(handlers: Dict[Type[Event], Callable]) -> List[Optional[Callable]]:
+    """Lay out a class-keyed handler table as a list indexed by event opcode"""
+    return [handlers.get(cls) for cls in _EVENT_OPCODES]
+
+
+def _encode_opcodes(events: List[Event]) -> array:
+    """Encode a batch of events as opcodes, using _OP_OTHER for unknown classes"""
+    get_opcode = _EVENT_OPCODES.get
+    return array('B', [get_opcode(type(event), _OP_OTHER) for event in events])
+
+
 # Order Status Enum
 class OrderStatus(Enum):
     PENDING = "pending"
@@ -87,13 +175,13 @@ class AggregateRoot(ABC):
     
     def apply_event(self, event: Event) -> None:
         """Apply an event to the aggregate and update version"""
-        event.aggregate_id = self.aggregate_id
-        event.version = self.version + 1
         self._handle_event(event)
         self.version = event.version
     
     def raise_event(self, event: Event) -> None:
         """Raise a new event and add to uncommitted events"""
+        # Events are immutable, so stamp this aggregate's identity onto a copy
+        event = replace(event, aggregate_id=self.aggregate_id, version=self.version + 1)
         self.apply_event(event)
         self.uncommitted_events.append(event)
     
@@ -105,16 +193,37 @@ class AggregateRoot(ABC):
         """Get all uncommitted events"""
         return self.uncommitted_events.copy()
     
+    def pop_uncommitted_events(self) -> List[Event]:
+        """Take the uncommitted events, leaving a fresh empty list in their place"""
+        events = self.uncommitted_events
+        self.uncommitted_events = []
+        return events
+    
     @abstractmethod
     def _handle_event(self, event: Event) -> None:
         """Handle specific event types - must be implemented by subclasses"""
         pass
+    
+    # Snapshots are optional: the Repository only calls the hooks below for
+    # aggregates that set this flag, the rest are always replayed in full
+    supports_snapshots: ClassVar[bool] = False
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Capture aggregate state, including id and version, for a snapshot"""
+        raise NotImplementedError
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> 'AggregateRoot':
+        """Rehydrate an aggregate from state captured by to_snapshot"""
+        raise NotImplementedError
 
 
 # Order Aggregate Root
 class Order(AggregateRoot):
     """Order aggregate root that maintains order state through events"""
     
+    supports_snapshots = True
+    
     def __init__(self, aggregate_id: UUID = None):
         super().__init__(aggregate_id)
         self.customer_id: Optional[UUID] = None
@@ -195,67 +304,113 @@ class Order(AggregateRoot):
         )
         self.raise_event(event)
     
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Capture order state for a snapshot"""
+        return {
+            'aggregate_id': self.aggregate_id,
+            'version': self.version,
+            'customer_id': self.customer_id,
+            'items': {product_id: dict(item) for product_id, item in self.items.items()},
+            'total_amount': self.total_amount,
+            'currency': self.currency,
+            'status': self.status,
+            'shipping_info': dict(self.shipping_info),
+            'payment_info': dict(self.payment_info)
+        }
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> 'Order':
+        """Rehydrate an order from a snapshot"""
+        order = cls(data['aggregate_id'])
+        order.version = data['version']
+        order.customer_id = data['customer_id']
+        # Copy mutable state so the stored snapshot can be reused
+        order.items = {product_id: dict(item) for product_id, item in data['items'].items()}
+        order.total_amount = data['total_amount']
+        order.currency = data['currency']
+        order.status = data['status']
+        order.shipping_info = dict(data['shipping_info'])
+        order.payment_info = dict(data['payment_info'])
+        return order
+    
     def _handle_event(self, event: Event) -> None:
         """Handle different event types"""
-        if isinstance(event, OrderCreated):
-            self.customer_id = event.customer_id
-            self.currency = event.currency
-            self.total_amount = event.total_amount
-            self.status = OrderStatus.PENDING
-            # Initialize items from event
-            for item in event.items:
-                self.items[item['product_id']] = item
-        
-        elif isinstance(event, OrderItemAdded):
-            if event.product_id in self.items:
-                # Update existing item
-                self.items[event.product_id]['quantity'] += event.quantity
-            else:
-                # Add new item
-                self.items[event.product_id] = {
-                    'product_id': event.product_id,
-                    'quantity': event.quantity,
-                    'unit_price': event.unit_price,
-                    'item_name': event.item_name
-                }
-            self._recalculate_total()
-        
-        elif isinstance(event, OrderItemRemoved):
-            if event.product_id in self.items:
-                current_qty = self.items[event.product_id]['quantity']
-                if current_qty <= event.quantity:
-                    del self.items[event.product_id]
-                else:
-                    self.items[event.product_id]['quantity'] -= event.quantity
-                self._recalculate_total()
-        
-        elif isinstance(event, OrderShipped):
-            self.status = OrderStatus.SHIPPED
-            self.shipping_info = {
-                'address': event.shipping_address,
-                'tracking_number': event.tracking_number,
-                'carrier': event.carrier,
-                'shipped_at': event.timestamp
+        handler = self._HANDLERS.get(type(event))
+        if handler:
+            handler(self, event)
+    
+    def _handle_order_created(self, event: OrderCreated) -> None:
+        self.customer_id = event.customer_id
+        self.currency = event.currency
+        self.total_amount = event.total_amount
+        self.status = OrderStatus.PENDING
+        # Initialize items from event, copied so later changes leave the event intact
+        for item in event.items:
+            self.items[item['product_id']] = dict(item)
+    
+    def _handle_item_added(self, event: OrderItemAdded) -> None:
+        item = self.items.get(event.product_id)
+        if item is not None:
+            # Update existing item
+            item['quantity'] += event.quantity
+        else:
+            # Add new item
+            item = self.items[event.product_id] = {
+                'product_id': event.product_id,
+                'quantity': event.quantity,
+                'unit_price': event.unit_price,
+                'item_name': event.item_name
             }
+        # Totals are kept up to date incrementally rather than re-summed per event
+        self.total_amount += event.quantity * item['unit_price']
+    
+    def _handle_item_removed(self, event: OrderItemRemoved) -> None:
+        item = self.items.get(event.product_id)
+        if item is None:
+            return
         
-        elif isinstance(event, OrderCancelled):
-            self.status = OrderStatus.CANCELLED
+        removed_qty = min(item['quantity'], event.quantity)
+        if removed_qty == item['quantity']:
+            del self.items[event.product_id]
+        else:
+            item['quantity'] -= removed_qty
         
-        elif isinstance(event, PaymentProcessed):
-            self.status = OrderStatus.CONFIRMED
-            self.payment_info = {
-                'method': event.payment_method,
-                'amount': event.amount,
-                'transaction_id': event.transaction_id,
-                'processed_at': event.timestamp
-            }
+        if self.items:
+            self.total_amount -= removed_qty * item['unit_price']
+        else:
+            # Avoid leaving float residue behind once the order is empty
+            self.total_amount = 0.0
+    
+    def _handle_order_shipped(self, event: OrderShipped) -> None:
+        self.status = OrderStatus.SHIPPED
+        self.shipping_info = {
+            'address': event.shipping_address,
+            'tracking_number': event.tracking_number,
+            'carrier': event.carrier,
+            'shipped_at': event.timestamp
+        }
     
-    def _recalculate_total(self):
-        """Recalculate total amount based on current items"""
-        self.total_amount = sum(
-            item['quantity'] * item['unit_price'] 
-            for item in self.items.values()
-        )
+    def _handle_order_cancelled(self, event: OrderCancelled) -> None:
+        self.status = OrderStatus.CANCELLED
+    
+    def _handle_payment_processed(self, event: PaymentProcessed) -> None:
+        self.status = OrderStatus.CONFIRMED
+        self.payment_info = {
+            'method': event.payment_method,
+            'amount': event.amount,
+            'transaction_id': event.transaction_id,
+            'processed_at': event.timestamp
+        }
+    
+    # Dispatch on the exact event class: one dict lookup instead of an isinstance chain
+    _HANDLERS = {
+        OrderCreated: _handle_order_created,
+        OrderItemAdded: _handle_item_added,
+        OrderItemRemoved: _handle_item_removed,
+        OrderShipped: _handle_order_shipped,
+        OrderCancelled: _handle_order_cancelled,
+        PaymentProcessed: _handle_payment_processed,
+    }
 
 
 # Event Store Implementation
@@ -263,15 +418,18 @@ class EventStore:
     """Append-only event store for persisting events"""
     
     def __init__(self):
-        self._events: Dict[UUID, List[Event]] = {}
+        # Per-aggregate streams; list.extend is amortized O(1) and tail slices stay O(k)
+        self._events: Dict[UUID, List[Event]] = defaultdict(list)
         self._snapshots: Dict[UUID, Dict[str, Any]] = {}
+        # Every event in commit order, with the running maximum timestamp at
+        # each position so timestamp queries can bisect instead of scanning
+        self._global_log: List[Event] = []
+        self._global_ts: List[int] = []
+        self._global_opcodes = array('B')
     
     def append_events(self, aggregate_id: UUID, events: List[Event], expected_version: int = None) -> None:
-        """Append events to the store with optimistic concurrency control"""
-        if aggregate_id not in self._events:
-            self._events[aggregate_id] = []
-        
-        current_version = len(self._events[aggregate_id])
+        """Append versioned events to the store with optimistic concurrency control"""
+        current_version = len(self._events.get(aggregate_id, ()))
         
         # Optimistic concurrency check
         if expected_version is not None and current_version != expected_version:
@@ -279,37 +437,69 @@ class EventStore:
                 f"Expected version {expected_version}, but current version is {current_version}"
             )
         
-        # Append events
+        if not events:
+            return
+        
+        # Aggregates assign versions as events are raised, so check the batch
+        # lines up with the stream instead of re-stamping every event
+        if (events[0].version != current_version + 1
+                or events[-1].version != current_version + len(events)):
+            raise ValueError(
+                f"Event versions {events[0].version}..{events[-1].version} do not follow "
+                f"current version {current_version}"
+            )
+        
+        # Encode before touching any state so a failure leaves the store as it was
+        opcodes = _encode_opcodes(events)
+        self._events[aggregate_id].extend(events)
+        self._log_events(events, opcodes)
+    
+    def _log_events(self, events: List[Event], opcodes: array) -> None:
+        """Record a batch of events and their opcodes in the global log"""
+        self._global_log.extend(events)
+        self._global_opcodes.extend(opcodes)
+        watermark = self._global_ts[-1] if self._global_ts else None
         for event in events:
-            event.aggregate_id = aggregate_id
-            event.version = current_version + 1
-            self._events[aggregate_id].append(event)
-            current_version += 1
+            if watermark is None or event.timestamp > watermark:
+                watermark = event.timestamp
+            self._global_ts.append(watermark)
     
     def get_events(self, aggregate_id: UUID, from_version: int = 0) -> List[Event]:
         """Get events for an aggregate from a specific version"""
-        if aggregate_id not in self._events:
-            return []
+        return self._events.get(aggregate_id, [])[from_version:]
+    
+    def iter_events(self, aggregate_id: UUID, from_version: int = 0) -> Iterator[Event]:
+        """Iterate events for an aggregate from a specific version; full replays skip the copy"""
+        stream = self._events.get(aggregate_id, [])
+        if not from_version:
+            return iter(stream)
+        # Copying a short tail is cheaper than skipping a long prefix with islice
+        return iter(stream[from_version:])
+    
+    def get_events_from_position(self, position: int) -> List[Event]:
+        """Get events from a position in the global commit-ordered log"""
+        return self._global_log[position:]
+    
+    def get_all_events(self, from_timestamp: Optional[int] = None) -> List[Event]:
+        """Get all events in commit order, optionally only those after a timestamp"""
+        if from_timestamp is None:
+            return list(self._global_log)
         
-        return self._events[aggregate_id][from_version:]
+        # Everything before the watermark crossing is at or before from_timestamp;
+        # past it, late-committed events may still carry older timestamps
+        start = bisect.bisect_right(self._global_ts, from_timestamp)
+        return [e for e in self._global_log[start:] if e.timestamp > from_timestamp]
     
-    def get_all_events(self, from_timestamp: datetime = None) -> List[Event]:
-        """Get all events, optionally from a specific timestamp"""
-        all_events = []
-        for events in self._events.values():
-            all_events.extend(events)
-        
-        if from_timestamp:
-            all_events = [e for e in all_events if e.timestamp >= from_timestamp]
-        
-        return sorted(all_events, key=lambda e: e.timestamp)
+    def encode_trace(self) -> Tuple[array, List[Event]]:
+        """Get the global log as parallel arrays of event opcodes and events"""
+        return array('B', self._global_opcodes), list(self._global_log)
     
     def save_snapshot(self, aggregate_id: UUID, snapshot: Dict[str, Any], version: int) -> None:
         """Save a snapshot of aggregate state"""
         self._snapshots[aggregate_id] = {
             'data': snapshot,
             'version': version,
-            'timestamp': datetime.utcnow()
+            'timestamp': time.time_ns()
         }
     
     def get_snapshot(self, aggregate_id: UUID) -> Optional[Dict[str, Any]]:
@@ -321,30 +511,51 @@ class EventStore:
 class Repository:
     """Repository for loading and saving aggregates"""
     
-    def __init__(self, event_store: EventStore):
+    def __init__(self, event_store: EventStore, snapshot_interval: int = 100):
         self.event_store = event_store
+        # Snapshot an aggregate each time its version crosses a multiple of this
+        self.snapshot_interval = snapshot_interval
     
     def save(self, aggregate: AggregateRoot) -> None:
         """Save aggregate by appending uncommitted events"""
-        uncommitted = aggregate.get_uncommitted_events()
+        uncommitted = aggregate.pop_uncommitted_events()
         if uncommitted:
-            self.event_store.append_events(
-                aggregate.aggregate_id,
-                uncommitted,
-                aggregate.version - len(uncommitted)
-            )
-            aggregate.mark_events_as_committed()
+            try:
+                self.event_store.append_events(
+                    aggregate.aggregate_id,
+                    uncommitted,
+                    aggregate.version - len(uncommitted)
+                )
+            except (ConcurrencyError, ValueError):
+                # Nothing was appended; hand the events back to the aggregate
+                aggregate.uncommitted_events[:0] = uncommitted
+                raise
+            
+            interval = self.snapshot_interval
+            crossed = interval and aggregate.version // interval > (aggregate.version - len(uncommitted)) // interval
+            if crossed and aggregate.supports_snapshots:
+                self.event_store.save_snapshot(
+                    aggregate.aggregate_id, aggregate.to_snapshot(), aggregate.version
+                )
     
     def load(self, aggregate_id: UUID, aggregate_class: Type[AggregateRoot]) -> Optional[AggregateRoot]:
-        """Load aggregate by replaying events"""
-        events = self.event_store.get_events(aggregate_id)
-        if not events:
-            return None
+        """Load aggregate from its latest snapshot, replaying only later events"""
+        snapshot = None
+        if aggregate_class.supports_snapshots:
+            snapshot = self.event_store.get_snapshot(aggregate_id)
+        if snapshot:
+            aggregate = aggregate_class.from_snapshot(snapshot['data'])
+            events = self.event_store.iter_events(aggregate_id, from_version=snapshot['version'])
+        else:
+            aggregate = aggregate_class(aggregate_id)
+            events = self.event_store.iter_events(aggregate_id)
         
-        aggregate = aggregate_class(aggregate_id)
         for event in events:
             aggregate.apply_event(event)
         
+        if aggregate.version == 0:
+            return None
+        
         aggregate.mark_events_as_committed()
         return aggregate
 
@@ -357,6 +568,26 @@ class ReadModel(ABC):
     def handle_event(self, event: Event) -> None:
         """Handle an event and update the read model"""
         pass
+    
+    # Opcode-indexed handler table built with _dispatch_table; read models
+    # without one have every event routed through handle_event
+    _DISPATCH: Optional[List[Optional[Callable]]] = None
+    
+    def dispatch(self, opcode: int, event: Event) -> None:
+        """Handle an event whose class has already been encoded as an opcode"""
+        table = self._DISPATCH
+        if table is None or opcode == _OP_OTHER:
+            self.handle_event(event)
+            return
+        handler = table[opcode]
+        if handler:
+            handler(self, event)
+    
+    def replay(self, opcodes: array, events: List[Event]) -> None:
+        """Apply an encoded trace, as produced by EventStore.encode_trace"""
+        dispatch = self.dispatch
+        for opcode, event in zip(opcodes, events):
+            dispatch(opcode, event)
 
 
 class ProjectionBuilder:
@@ -365,36 +596,29 @@ class ProjectionBuilder:
     def __init__(self, event_store: EventStore):
         self.event_store = event_store
         self.read_models: Dict[str, ReadModel] = {}
-        self.last_processed_timestamp: Optional[datetime] = None
+        # Per read model position in the event store's global log
+        self._cursors: Dict[str, int] = {}
     
     def register_read_model(self, name: str, read_model: ReadModel) -> None:
         """Register a read model for projection building"""
         self.read_models[name] = read_model
+        self._cursors[name] = 0
     
     def rebuild_all_projections(self) -> None:
         """Rebuild all projections from the beginning"""
-        events = self.event_store.get_all_events()
-        for event in events:
-            for read_model in self.read_models.values():
-                read_model.handle_event(event)
-        
-        if events:
-            self.last_processed_timestamp = max(e.timestamp for e in events)
+        opcodes, events = self.event_store.encode_trace()
+        for name, read_model in self.read_models.items():
+            read_model.replay(opcodes, events)
+            self._cursors[name] = len(events)
     
     def update_projections(self) -> None:
-        """Update projections with new events since last update"""
-        events = self.event_store.get_all_events(self.last_processed_timestamp)
-        
-        # Skip events we've already processed
-        if self.last_processed_timestamp:
-            events = [e for e in events if e.timestamp > self.last_processed_timestamp]
-        
-        for event in events:
-            for read_model in self.read_models.values():
+        """Update each read model with the events logged since its last update"""
+        for name, read_model in self.read_models.items():
+            position = self._cursors[name]
+            events = self.event_store.get_events_from_position(position)
+            for event in events:
                 read_model.handle_event(event)
-        
-        if events:
-            self.last_processed_timestamp = max(e.timestamp for e in events)
+            self._cursors[name] = position + len(events)
 
 
 # Read Models
@@ -403,68 +627,151 @@ class OrderSummaryReadModel(ReadModel):
     
     def __init__(self):
         self.orders: Dict[UUID, Dict[str, Any]] = {}
+        # Numeric fields are kept in typed columns indexed by a dense per-order
+        # position; query results merge them back into the summary dict
+        self._order_idx: Dict[UUID, int] = {}
+        self._totals = array('d')
+        self._last_updated = array('q')
+        # Secondary indexes so queries touch only matching orders
+        # Keyed by dicts used as ordered sets, so results keep insertion order
+        self.customer_to_orders: Dict[UUID, Dict[UUID, None]] = defaultdict(dict)
+        self.status_to_orders: Dict[str, Dict[UUID, None]] = defaultdict(dict)
     
     def handle_event(self, event: Event) -> None:
         """Handle events and update order summary"""
+        handler = self._HANDLERS.get(type(event))
+        if handler:
+            handler(self, event)
+    
+    def _handle_order_created(self, event: OrderCreated) -> None:
         aggregate_id = event.aggregate_id
+        previous = self.orders.get(aggregate_id)
+        if previous is not None:
+            self.customer_to_orders[previous['customer_id']].pop(aggregate_id, None)
+            self.status_to_orders[previous['status']].pop(aggregate_id, None)
         
-        if isinstance(event, OrderCreated):
-            self.orders[aggregate_id] = {
-                'order_id': aggregate_id,
-                'customer_id': event.customer_id,
-                'status': OrderStatus.PENDING.value,
-                'total_amount': event.total_amount,
-                'currency': event.currency,
-                'created_at': event.timestamp,
-                'item_count': len(event.items),
-                'last_updated': event.timestamp
-            }
-        
-        elif isinstance(event, PaymentProcessed):
-            if aggregate_id in self.orders:
-                self.orders[aggregate_id]['status'] = OrderStatus.CONFIRMED.value
-                self.orders[aggregate_id]['payment_method'] = event.payment_method
-                self.orders[aggregate_id]['last_updated'] = event.timestamp
-        
-        elif isinstance(event, OrderShipped):
-            if aggregate_id in self.orders:
-                self.orders[aggregate_id]['status'] = OrderStatus.SHIPPED.value
-                self.orders[aggregate_id]['tracking_number'] = event.tracking_number
-                self.orders[aggregate_id]['carrier'] = event.carrier
-                self.orders[aggregate_id]['shipped_at'] = event.timestamp
-                self.orders[aggregate_id]['last_updated'] = event.timestamp
+        idx = self._order_idx.get(aggregate_id)
+        if idx is None:
+            self._order_idx[aggregate_id] = len(self._totals)
+            self._totals.append(event.total_amount)
+            self._last_updated.append(event.timestamp)
+        else:
+            self._totals[idx] = event.total_amount
+            self._last_updated[idx] = event.timestamp
         
-        elif isinstance(event, OrderCancelled):
-            if aggregate_id in self.orders:
-                self.orders[aggregate_id]['status'] = OrderStatus.CANCELLED.value
-                self.orders[aggregate_id]['cancelled_at'] = event.timestamp
-                self.orders[aggregate_id]['cancel_reason'] = event.reason
-                self.orders[aggregate_id]['last_updated'] = event.timestamp
-        
-        elif isinstance(event, (OrderItemAdded, OrderItemRemoved)):
-            if aggregate_id in self.orders:
-                # Would need to recalculate totals - simplified here
-                self.orders[aggregate_id]['last_updated'] = event.timestamp
+        self.customer_to_orders[event.customer_id][aggregate_id] = None
+        self.status_to_orders[OrderStatus.PENDING.value][aggregate_id] = None
+        self.orders[aggregate_id] = {
+            'order_id': aggregate_id,
+            'customer_id': event.customer_id,
+            'status': OrderStatus.PENDING.value,
+            'currency': event.currency,
+            'created_at': event.timestamp,
+            'item_count': len(event.items)
+        }
+    
+    def _handle_payment_processed(self, event: PaymentProcessed) -> None:
+        aggregate_id = event.aggregate_id
+        if aggregate_id in self.orders:
+            self._set_status(aggregate_id, OrderStatus.CONFIRMED)
+            self.orders[aggregate_id]['payment_method'] = event.payment_method
+            self._last_updated[self._order_idx[aggregate_id]] = event.timestamp
+    
+    def _handle_order_shipped(self, event: OrderShipped) -> None:
+        aggregate_id = event.aggregate_id
+        if aggregate_id in self.orders:
+            self._set_status(aggregate_id, OrderStatus.SHIPPED)
+            self.orders[aggregate_id]['tracking_number'] = event.tracking_number
+            self.orders[aggregate_id]['carrier'] = event.carrier
+            self.orders[aggregate_id]['shipped_at'] = event.timestamp
+            self._last_updated[self._order_idx[aggregate_id]] = event.timestamp
+    
+    def _handle_order_cancelled(self, event: OrderCancelled) -> None:
+        aggregate_id = event.aggregate_id
+        if aggregate_id in self.orders:
+            self._set_status(aggregate_id, OrderStatus.CANCELLED)
+            self.orders[aggregate_id]['cancelled_at'] = event.timestamp
+            self.orders[aggregate_id]['cancel_reason'] = event.reason
+            self._last_updated[self._order_idx[aggregate_id]] = event.timestamp
+    
+    def _handle_item_changed(self, event: Event) -> None:
+        idx = self._order_idx.get(event.aggregate_id)
+        if idx is not None:
+            # Would need to recalculate totals - simplified here
+            self._last_updated[idx] = event.timestamp
+    
+    def _set_status(self, order_id: UUID, status: OrderStatus) -> None:
+        """Move an order to a new status, keeping the status index in step"""
+        order = self.orders[order_id]
+        self.status_to_orders[order['status']].pop(order_id, None)
+        self.status_to_orders[status.value][order_id] = None
+        order['status'] = status.value
+    
+    _HANDLERS = {
+        OrderCreated: _handle_order_created,
+        PaymentProcessed: _handle_payment_processed,
+        OrderShipped: _handle_order_shipped,
+        OrderCancelled: _handle_order_cancelled,
+        OrderItemAdded: _handle_item_changed,
+        OrderItemRemoved: _handle_item_changed,
+    }
+    _DISPATCH = _dispatch_table(_HANDLERS)
+    
+    def replay(self, opcodes: array, events: List[Event]) -> None:
+        """Apply an encoded trace, writing item-change timestamps straight into the column"""
+        dispatch = self.dispatch
+        order_idx = self._order_idx
+        last_updated = self._last_updated
+        for opcode, event in zip(opcodes, events):
+            if opcode == _OP_ITEM_ADDED or opcode == _OP_ITEM_REMOVED:
+                idx = order_idx.get(event.aggregate_id)
+                if idx is not None:
+                    last_updated[idx] = event.timestamp
+            else:
+                dispatch(opcode, event)
+    
+    def _summary(self, order_id: UUID) -> Dict[str, Any]:
+        """Assemble an order summary from its record and numeric columns"""
+        idx = self._order_idx[order_id]
+        summary = dict(self.orders[order_id])
+        summary['total_amount'] = self._totals[idx]
+        summary['last_updated'] = self._last_updated[idx]
+        return summary
     
     def get_order_summary(self, order_id: UUID) -> Optional[Dict[str, Any]]:
         """Get order summary by ID"""
-        return self.orders.get(order_id)
+        if order_id not in self.orders:
+            return None
+        return self._summary(order_id)
     
     def get_orders_by_customer(self, customer_id: UUID) -> List[Dict[str, Any]]:
         """Get all orders for a customer"""
         return [
-            order for order in self.orders.values()
-            if order['customer_id'] == customer_id
+            self._summary(order_id)
+            for order_id in self.customer_to_orders.get(customer_id, ())
         ]
     
     def get_orders_by_status(self, status: OrderStatus) -> List[Dict[str, Any]]:
         """Get all orders with a specific status"""
         return [
-            order for order in self.orders.values()
-            if order['status'] == status.value
+            self._summary(order_id)
+            for order_id in self.status_to_orders.get(status.value, ())
         ]
 
 
+@njit(cache=True)
+def bulk_apply_inventory(opcodes, product_idx, quantities, out):
+    """Apply a trace of item events to reserved quantities indexed by product"""
+    for i in range(len(opcodes)):
+        product = product_idx[i]
+        if product < 0:
+            continue
+        if opcodes[i] == _OP_ITEM_ADDED:
+            out[product] += quantities[i]
+        elif opcodes[i] == _OP_ITEM_REMOVED:
+            out[product] = max(0, out[product] - quantities[i])
+
+
 class InventoryReadModel(ReadModel):
     """Read model for inventory tracking"""
     
@@ -474,28 +781,59 @@ class InventoryReadModel(ReadModel):
     
     def handle_event(self, event: Event) -> None:
         """Handle events that affect inventory"""
-        if isinstance(event, OrderItemAdded):
-            # Reserve inventory
-            product_id = event.product_id
-            if product_id not in self.reserved_items:
-                self.reserved_items[product_id] = 0
-            self.reserved_items[product_id] += event.quantity
-        
-        elif isinstance(event, OrderItemRemoved):
-            # Release inventory reservation
-            product_id = event.product_id
-            if product_id in self.reserved_items:
-                self.reserved_items[product_id] = max(
-                    0, self.reserved_items[product_id] - event.quantity
-                )
+        handler = self._HANDLERS.get(type(event))
+        if handler:
+            handler(self, event)
+    
+    def _handle_item_added(self, event: OrderItemAdded) -> None:
+        # Reserve inventory
+        product_id = event.product_id
+        if product_id not in self.reserved_items:
+            self.reserved_items[product_id] = 0
+        self.reserved_items[product_id] += event.quantity
+    
+    def _handle_item_removed(self, event: OrderItemRemoved) -> None:
+        # Release inventory reservation
+        product_id = event.product_id
+        if product_id in self.reserved_items:
+            self.reserved_items[product_id] = max(
+                0, self.reserved_items[product_id] - event.quantity
+            )
+    
+    # OrderShipped would commit the inventory reduction and OrderCancelled would
+    # release the order's reservations; both need order items (simplified here)
+    _HANDLERS = {
+        OrderItemAdded: _handle_item_added,
+        OrderItemRemoved: _handle_item_removed,
+    }
+    _DISPATCH = _dispatch_table(_HANDLERS)
+    
+    def replay(self, opcodes: array, events: List[Event]) -> None:
+        """Apply an encoded trace in a single pass of the inventory kernel"""
+        product_ids = list(self.reserved_items)
+        product_index = {product_id: idx for idx, product_id in enumerate(product_ids)}
+        reserved = array('q', self.reserved_items.values())
         
-        elif isinstance(event, OrderShipped):
-            # Commit inventory reduction (simplified - would need order items)
-            pass
+        # Flatten the item events into typed columns; a product only gets a slot
+        # once it has been added, matching the per-event handlers
+        trace_opcodes, trace_products, trace_quantities = array('B'), array('q'), array('q')
+        for opcode, event in zip(opcodes, events):
+            if opcode == _OP_ITEM_ADDED:
+                idx = product_index.get(event.product_id)
+                if idx is None:
+                    idx = product_index[event.product_id] = len(product_ids)
+                    product_ids.append(event.product_id)
+                    reserved.append(0)
+            elif opcode == _OP_ITEM_REMOVED:
+                idx = product_index.get(event.product_id, -1)
+            else:
+                continue
+            trace_opcodes.append(opcode)
+            trace_products.append(idx)
+            trace_quantities.append(event.quantity)
         
-        elif isinstance(event, OrderCancelled):
-            # Release all reservations for this order (simplified)
-            pass
+        bulk_apply_inventory(trace_opcodes, trace_products, trace_quantities, reserved)
+        self.reserved_items.update(zip(product_ids, reserved))
     
     def get_reserved_quantity(self, product_id: UUID) -> int:
         """Get reserved quantity for a product"""
@@ -508,47 +846,56 @@ class CustomerOrderHistoryReadModel(ReadModel):
     def __init__(self):
         self.customer_orders: Dict[UUID, List[Dict[str, Any]]] = {}
         self.customer_stats: Dict[UUID, Dict[str, Any]] = {}
+        # order_id -> (customer_id, order summary) so later events avoid a full scan
+        self._order_index: Dict[UUID, Tuple[UUID, Dict[str, Any]]] = {}
     
     def handle_event(self, event: Event) -> None:
         """Handle events for customer order history"""
-        if isinstance(event, OrderCreated):
-            customer_id = event.customer_id
-            
-            if customer_id not in self.customer_orders:
-                self.customer_orders[customer_id] = []
-                self.customer_stats[customer_id] = {
-                    'total_orders': 0,
-                    'total_spent': 0.0,
-                    'first_order_date': event.timestamp,
-                    'last_order_date': event.timestamp
-                }
-            
-            order_summary = {
-                'order_id': event.aggregate_id,
-                'created_at': event.timestamp,
-                'total_amount': event.total_amount,
-                'currency': event.currency,
-                'status': OrderStatus.PENDING.value
+        handler = self._HANDLERS.get(type(event))
+        if handler:
+            handler(self, event)
+    
+    def _handle_order_created(self, event: OrderCreated) -> None:
+        customer_id = event.customer_id
+        
+        if customer_id not in self.customer_orders:
+            self.customer_orders[customer_id] = []
+            self.customer_stats[customer_id] = {
+                'total_orders': 0,
+                'total_spent': 0.0,
+                'first_order_date': event.timestamp,
+                'last_order_date': event.timestamp
             }
-            
-            self.customer_orders[customer_id].append(order_summary)
-            self.customer_stats[customer_id]['total_orders'] += 1
-            self.customer_stats[customer_id]['last_order_date'] = event.timestamp
         
-        elif isinstance(event, PaymentProcessed):
-            customer_orders = self._find_customer_orders_by_order_id(event.aggregate_id)
-            if customer_orders:
-                customer_id, order_summary = customer_orders
-                order_summary['status'] = OrderStatus.CONFIRMED.value
-                self.customer_stats[customer_id]['total_spent'] += event.amount
+        order_summary = {
+            'order_id': event.aggregate_id,
+            'created_at': event.timestamp,
+            'total_amount': event.total_amount,
+            'currency': event.currency,
+            'status': OrderStatus.PENDING.value
+        }
+        
+        self.customer_orders[customer_id].append(order_summary)
+        self._order_index[event.aggregate_id] = (customer_id, order_summary)
+        self.customer_stats[customer_id]['total_orders'] += 1
+        self.customer_stats[customer_id]['last_order_date'] = event.timestamp
+    
+    def _handle_payment_processed(self, event: PaymentProcessed) -> None:
+        customer_orders = self._find_customer_orders_by_order_id(event.aggregate_id)
+        if customer_orders:
+            customer_id, order_summary = customer_orders
+            order_summary['status'] = OrderStatus.CONFIRMED.value
+            self.customer_stats[customer_id]['total_spent'] += event.amount
     
     def _find_customer_orders_by_order_id(self, order_id: UUID):
         """Find customer and order summary by order ID"""
-        for customer_id, orders in self.customer_orders.items():
-            for order in orders:
-                if order['order_id'] == order_id:
-                    return customer_id, order
-        return None
+        return self._order_index.get(order_id)
+    
+    _HANDLERS = {
+        OrderCreated: _handle_order_created,
+        PaymentProcessed: _handle_payment_processed,
+    }
+    _DISPATCH = _dispatch_table(_HANDLERS)
     
     def get_customer_orders(self, customer_id: UUID) -> List[Dict[str, Any]]:
         """Get all orders for a customer"""
@@ -571,70 +918,71 @@ class DomainError(Exception):
 
 
 # Event Serialization
+@lru_cache(maxsize=4096)
+def _uuid_str(value: UUID) -> str:
+    """Format a UUID; memoized since the same ids recur across many events"""
+    return str(value)
+
+
+def _json_default(value: Any) -> str:
+    """Encode values the stdlib json module does not handle natively"""
+    if isinstance(value, UUID):
+        return _uuid_str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
 class EventSerializer:
     """Serializes and deserializes events for storage"""
     
     @staticmethod
     def serialize(event: Event) -> str:
         """Serialize event to JSON string"""
+        # orjson encodes UUIDs natively; the stdlib path goes through _json_default
         event_dict = {
-            'event_id': str(event.event_id),
-            'aggregate_id': str(event.aggregate_id) if event.aggregate_id else None,
+            'event_id': event.event_id,
+            'aggregate_id': event.aggregate_id,
             'event_type': event.event_type,
             'version': event.version,
-            'timestamp': event.timestamp.isoformat(),
+            'timestamp': event.timestamp,
             'metadata': event.metadata,
-            'data': {}
+            'data': {
+                field_name: getattr(event, field_name)
+                for field_name in _DATA_FIELDS.get(type(event)) or _payload_fields(type(event))
+            }
         }
         
-        # Extract event-specific data
-        for field_name, field_value in event.__dict__.items():
-            if field_name not in ['event_id', 'aggregate_id', 'event_type', 'version', 'timestamp', 'metadata']:
-                if isinstance(field_value, UUID):
-                    event_dict['data'][field_name] = str(field_value)
-                else:
-                    event_dict['data'][field_name] = field_value
-        
-        return json.dumps(event_dict, default=str)
+        if orjson is not None:
+            return orjson.dumps(event_dict, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(event_dict, default=_json_default, separators=(',', ':'))
     
     @staticmethod
     def deserialize(event_json: str) -> Event:
         """Deserialize event from JSON string"""
-        event_dict = json.loads(event_json)
-        
-        # Map event types to classes
-        event_classes = {
-            'OrderCreated': OrderCreated,
-            'OrderItemAdded': OrderItemAdded,
-            'OrderItemRemoved': OrderItemRemoved,
-            'OrderShipped': OrderShipped,
-            'OrderCancelled': OrderCancelled,
-            'PaymentProcessed': PaymentProcessed,
-        }
+        event_dict = orjson.loads(event_json) if orjson is not None else json.loads(event_json)
         
-        event_class = event_classes.get(event_dict['event_type'])
+        event_class = _EVENT_CLASSES.get(event_dict['event_type'])
         if not event_class:
             raise ValueError(f"Unknown event type: {event_dict['event_type']}")
         
         # Create event instance
         event_data = event_dict['data']
         
-        # Convert UUID strings back to UUID objects
-        for key, value in event_data.items():
-            if key.endswith('_id') and isinstance(value, str):
-                try:
-                    event_data[key] = UUID(value)
-                except ValueError:
-                    pass  # Not a valid UUID string
-        
-        event = event_class(**event_data)
-        event.event_id = UUID(event_dict['event_id'])
-        event.aggregate_id = UUID(event_dict['aggregate_id']) if event_dict['aggregate_id'] else None
-        event.version = event_dict['version']
-        event.timestamp = datetime.fromisoformat(event_dict['timestamp'])
-        event.metadata = event_dict['metadata']
+        # Convert UUID strings back to UUID objects for the fields declared as UUIDs
+        for field_name in _UUID_FIELDS[event_class]:
+            value = event_data.get(field_name)
+            if value is not None:
+                event_data[field_name] = UUID(value)
         
-        return event
+        return event_class(
+            event_id=UUID(event_dict['event_id']),
+            aggregate_id=UUID(event_dict['aggregate_id']) if event_dict['aggregate_id'] else None,
+            version=event_dict['version'],
+            timestamp=event_dict['timestamp'],
+            metadata=event_dict['metadata'],
+            **event_data
+        )
 
 
 # Example Usage and Test
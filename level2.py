@@ -1,9 +1,24 @@
 # filename: order_processing.py
 
+from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Dict, Any, Type, Protocol, get_args
+from typing import Callable, List, Dict, Any, Optional, Type, Protocol, Tuple, get_args
+import pickle
+import threading
 import uuid
+import zlib
+
+try:
+    import lz4.block
+except ImportError:  # Optional: cold blocks fall back to zlib.
+    lz4 = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Parquet segments.
+    pa = pq = None
 
 # ==============================================================================
 # 1. Event Schema
@@ -17,7 +32,7 @@ class Event(Protocol):
     version: int
     timestamp: datetime = field(default_factory=datetime.utcnow)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OrderCreated:
     """Event: Represents the creation of a new order."""
     aggregate_id: str
@@ -25,7 +40,7 @@ class OrderCreated:
     customer_name: str
     timestamp: datetime = field(default_factory=datetime.utcnow)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ItemAddedToOrder:
     """Event: Represents an item being added to an existing order."""
     aggregate_id: str
@@ -34,7 +49,7 @@ class ItemAddedToOrder:
     quantity: int
     timestamp: datetime = field(default_factory=datetime.utcnow)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OrderShipped:
     """Event: Represents an order being shipped."""
     aggregate_id: str
@@ -47,18 +62,46 @@ class OrderShipped:
 #    - It doesn't store its state directly; it's reconstructed from events.
 # ==============================================================================
 
+def _compile_replay(handlers: Dict[type, Callable]) -> Callable:
+    """
+    Generates a replay loop specialized to a handler table: an if/elif ladder
+    of identity checks on each event's class, with no dispatch lookups.
+    """
+    namespace: Dict[str, Any] = {}
+    lines = [
+        "def _replay(aggregate, events):",
+        "    for event in events:",
+        "        cls = event.__class__",
+    ]
+    for i, (event_class, handler) in enumerate(handlers.items()):
+        lines.append(f"        {'if' if i == 0 else 'elif'} cls is C{i}:")
+        lines.append(f"            H{i}(aggregate, event)")
+        namespace[f"C{i}"] = event_class
+        namespace[f"H{i}"] = handler
+    exec(compile("\n".join(lines), "<replay>", "exec"), namespace)
+    return namespace["_replay"]
+
 class OrderAggregate:
     """
     The OrderAggregate is our "write model". It contains the logic for state
     transitions and validates commands. It's reconstructed from its event stream.
     """
+    __slots__ = ("id", "version", "customer_name", "status", "_idx", "_qty")
+
     def __init__(self, order_id: str):
         # We start with a default, initial state.
         self.id = order_id
         self.version = 0
         self.customer_name = ""
         self.status = "PENDING"
-        self.items = {}
+        # Items are kept as a name -> position index over a parallel list of
+        # quantities; the `items` dict is only built when asked for.
+        self._idx: Dict[str, int] = {}
+        self._qty: List[int] = []
+
+    @property
+    def items(self) -> Dict[str, int]:
+        return dict(zip(self._idx, self._qty))
 
     def _apply(self, event: Event):
         """
@@ -66,14 +109,9 @@ class OrderAggregate:
         This is the core of event sourcing's state management.
         """
         # A dictionary-based dispatch pattern for cleaner event handling.
-        handler_map = {
-            OrderCreated: self._handle_order_created,
-            ItemAddedToOrder: self._handle_item_added,
-            OrderShipped: self._handle_order_shipped
-        }
-        handler = handler_map.get(type(event))
+        handler = self._HANDLERS.get(type(event))
         if handler:
-            handler(event)
+            handler(self, event)
         self.version = event.version
 
     def _handle_order_created(self, event: OrderCreated):
@@ -81,11 +119,33 @@ class OrderAggregate:
         self.status = "CREATED"
 
     def _handle_item_added(self, event: ItemAddedToOrder):
-        self.items[event.item_name] = self.items.get(event.item_name, 0) + event.quantity
+        i = self._idx.get(event.item_name)
+        if i is None:
+            self._idx[event.item_name] = len(self._qty)
+            self._qty.append(event.quantity)
+        else:
+            self._qty[i] += event.quantity
 
     def _handle_order_shipped(self, event: OrderShipped):
         self.status = "SHIPPED"
 
+    # The dispatch table is built once, when the class is defined, rather than
+    # on every applied event.
+    _HANDLERS = {
+        OrderCreated: _handle_order_created,
+        ItemAddedToOrder: _handle_item_added,
+        OrderShipped: _handle_order_shipped
+    }
+
+    @classmethod
+    def _replayer(cls) -> Callable:
+        """Returns this class's compiled replay loop, building it on first use."""
+        replay = cls.__dict__.get("_replay")
+        if replay is None:
+            replay = _compile_replay(cls._HANDLERS)
+            cls._replay = replay
+        return replay
+
     @classmethod
     def from_events(cls, events: List[Event]):
         """
@@ -100,8 +160,30 @@ class OrderAggregate:
             raise TypeError("First event must be an OrderCreated event.")
 
         aggregate = cls(first_event.aggregate_id)
-        for event in events:
-            aggregate._apply(event)
+        # Replay through the compiled loop rather than calling _apply per
+        # event; the version only needs setting once, from the last event.
+        cls._replayer()(aggregate, events)
+        aggregate.version = events[-1].version
+        return aggregate
+
+    def snapshot_state(self) -> bytes:
+        """Serializes the aggregate's state for a Snapshot."""
+        return pickle.dumps(
+            {"customer_name": self.customer_name, "status": self.status, "_idx": self._idx, "_qty": self._qty},
+            pickle.HIGHEST_PROTOCOL,
+        )
+
+    @classmethod
+    def from_snapshot_and_events(cls, snapshot: "Snapshot", events: List[Event]):
+        """
+        Reconstructs the aggregate from a snapshot plus the events recorded
+        after it, instead of replaying the entire history.
+        """
+        aggregate = cls(snapshot.aggregate_id)
+        for name, value in pickle.loads(snapshot.state).items():
+            setattr(aggregate, name, value)
+        cls._replayer()(aggregate, events)
+        aggregate.version = events[-1].version if events else snapshot.version
         return aggregate
 
     def create_order(self, customer_name: str) -> Event:
@@ -131,7 +213,7 @@ class OrderAggregate:
         """Business logic: ships an order and returns the event."""
         if self.status == "SHIPPED":
             raise ValueError("Order is already shipped.")
-        if not self.items:
+        if not self._qty:
             raise ValueError("Cannot ship an order with no items.")
         new_version = self.version + 1
         return OrderShipped(
@@ -144,36 +226,260 @@ class OrderAggregate:
 #    - Our single source of truth.
 # ==============================================================================
 
+def _compress_block(data: bytes) -> bytes:
+    if lz4 is not None:
+        return lz4.block.compress(data, mode="high_compression")
+    return zlib.compress(data)
+
+def _decompress_block(data: bytes) -> bytes:
+    if lz4 is not None:
+        return lz4.block.decompress(data)
+    return zlib.decompress(data)
+
+class ConcurrencyError(ValueError):
+    """Raised when an append's expected_version doesn't match the stream."""
+
 class EventStore:
     """
     A simple in-memory implementation of an append-only event log.
     In a real system, this would be a database like Cassandra or MongoDB.
+
+    Only the most recent HOT_EVENTS events of each aggregate are guaranteed
+    to be live objects. Once the hot tail reaches twice that, everything but
+    the newest HOT_EVENTS is pickled, compressed and kept as a cold block
+    indexed by its first and last version.
+
+    flush_segment seals everything held in memory into a Parquet file;
+    attach_segment registers an existing one, e.g. on startup. Sealed events
+    are read back from the segments on demand.
     """
+    HOT_EVENTS = 128
+    SEGMENT_ROW_GROUP_SIZE = 64_000
+    LOCK_STRIPES = 64  # must be a power of two
+
     def __init__(self):
-        # A dictionary mapping aggregate_id to a list of its events.
+        # A dictionary mapping aggregate_id to the hot tail of its events.
         self._events: Dict[str, List[Event]] = {}
+        # A dictionary mapping aggregate_id to its compressed cold blocks,
+        # each stored as (start_version, end_version, block).
+        self._cold: Dict[str, List[Tuple[int, int, bytes]]] = {}
+        # Parquet segments, oldest first, as (path, min_aggregate_id,
+        # max_aggregate_id), and the last version of each aggregate that has
+        # been sealed into them.
+        self._segments: List[Tuple[str, str, str]] = []
+        self._sealed: Dict[str, int] = {}
+        # The current version of each aggregate, so it never has to be worked
+        # out from the stored events.
+        self._versions: Dict[str, int] = defaultdict(int)
+        # Writers to different aggregates rarely contend: each aggregate's
+        # stream is guarded by one of a fixed set of striped locks.
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _lock_for(self, aggregate_id: str) -> threading.Lock:
+        return self._locks[hash(aggregate_id) & (self.LOCK_STRIPES - 1)]
+
+    def current_version(self, aggregate_id: str) -> int:
+        """Returns the version of the last event appended for an aggregate."""
+        return self._versions.get(aggregate_id, 0)
     
     def append_events(self, aggregate_id: str, events: List[Event], expected_version: int):
         """
         Appends new events to the log, ensuring optimistic concurrency control.
         """
-        if aggregate_id not in self._events:
-            self._events[aggregate_id] = []
-        
-        current_version = len(self._events[aggregate_id])
-        if current_version != expected_version:
-            raise ValueError("Optimistic concurrency conflict! Version mismatch.")
-        
-        # Check that the events are in the correct version sequence.
-        for event in events:
-            if event.version != current_version + 1:
-                raise ValueError("Event version does not follow the sequence.")
-            current_version += 1
-            self._events[aggregate_id].append(event)
+        with self._lock_for(aggregate_id):
+            hot = self._events.setdefault(aggregate_id, [])
+            cold = self._cold.setdefault(aggregate_id, [])
+            
+            current_version = self._versions[aggregate_id]
+            if current_version != expected_version:
+                raise ConcurrencyError("Optimistic concurrency conflict! Version mismatch.")
+            
+            # Check that the events are in the correct version sequence before
+            # storing any of them, then add the whole batch at once.
+            for offset, event in enumerate(events, 1):
+                if event.version != current_version + offset:
+                    raise ValueError("Event version does not follow the sequence.")
+            hot.extend(events)
+            self._versions[aggregate_id] = current_version + len(events)
+
+            if len(hot) >= 2 * self.HOT_EVENTS:
+                batch = hot[:-self.HOT_EVENTS]
+                block = _compress_block(pickle.dumps(batch, pickle.HIGHEST_PROTOCOL))
+                cold.append((batch[0].version, batch[-1].version, block))
+                del hot[:-self.HOT_EVENTS]
         
-    def get_events_for_aggregate(self, aggregate_id: str) -> List[Event]:
-        """Retrieves the full event stream for a given aggregate."""
-        return self._events.get(aggregate_id, [])
+    def get_events_for_aggregate(self, aggregate_id: str, from_version: int = 0) -> List[Event]:
+        """
+        Retrieves the event stream for a given aggregate. Only events newer
+        than from_version are returned; cold blocks that end at or before it
+        are skipped without being decompressed.
+        """
+        # Take a consistent view under the lock; decompress outside it.
+        with self._lock_for(aggregate_id):
+            segments = list(self._segments) if self._sealed.get(aggregate_id, 0) > from_version else []
+            cold = list(self._cold.get(aggregate_id, ()))
+            hot = list(self._events.get(aggregate_id, ()))
+        events: List[Event] = []
+        for path, min_id, max_id in segments:
+            if not min_id <= aggregate_id <= max_id:
+                continue
+            table = pq.read_table(
+                path,
+                columns=["data"],
+                filters=[("aggregate_id", "==", aggregate_id), ("version", ">", from_version)],
+                memory_map=True,
+            )
+            events.extend(map(pickle.loads, table.column("data").to_pylist()))
+        for _, end_version, block in cold:
+            if end_version > from_version:
+                events.extend(pickle.loads(_decompress_block(block)))
+        events.extend(hot)
+        if events and events[0].version <= from_version:
+            del events[:from_version - events[0].version + 1]
+        return events
+
+    def flush_segment(self, path: str):
+        """
+        Writes every event held in memory to a Parquet segment at path and
+        drops them from memory. Repeated strings are dictionary encoded and
+        the file is Snappy compressed; each event is kept whole, pickled, in
+        the data column. Rows are sorted by (aggregate_id, version), so each
+        aggregate's events are contiguous.
+        """
+        if pq is None:
+            raise RuntimeError("pyarrow is required to write Parquet segments.")
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            aggregate_ids = sorted(self._events)
+            events: List[Event] = []
+            for aggregate_id in aggregate_ids:
+                for _, _, block in self._cold[aggregate_id]:
+                    events.extend(pickle.loads(_decompress_block(block)))
+                events.extend(self._events[aggregate_id])
+            if not events:
+                return
+            table = pa.table(
+                {
+                    "aggregate_id": [event.aggregate_id for event in events],
+                    "version": [event.version for event in events],
+                    "type": [type(event).__name__ for event in events],
+                    "data": [pickle.dumps(event, pickle.HIGHEST_PROTOCOL) for event in events],
+                    "timestamp": [event.timestamp for event in events],
+                },
+                schema=pa.schema([
+                    ("aggregate_id", pa.dictionary(pa.int32(), pa.string())),
+                    ("version", pa.int32()),
+                    ("type", pa.dictionary(pa.int32(), pa.string())),
+                    ("data", pa.binary()),
+                    ("timestamp", pa.timestamp("us")),
+                ]),
+            )
+            pq.write_table(
+                table,
+                path,
+                compression="snappy",
+                use_dictionary=True,
+                row_group_size=self.SEGMENT_ROW_GROUP_SIZE,
+            )
+            for event in events:
+                self._sealed[event.aggregate_id] = event.version
+            self._events.clear()
+            self._cold.clear()
+            self._segments.append((path, aggregate_ids[0], aggregate_ids[-1]))
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    def attach_segment(self, path: str):
+        """Registers a segment written by flush_segment, e.g. on startup."""
+        if pq is None:
+            raise RuntimeError("pyarrow is required to read Parquet segments.")
+        table = pq.read_table(path, columns=["aggregate_id", "version"], memory_map=True)
+        aggregate_ids = table.column("aggregate_id").to_pylist()
+        if not aggregate_ids:
+            return
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for aggregate_id, version in zip(aggregate_ids, table.column("version").to_pylist()):
+                if version > self._sealed.get(aggregate_id, 0):
+                    self._sealed[aggregate_id] = version
+                if version > self._versions[aggregate_id]:
+                    self._versions[aggregate_id] = version
+            self._segments.append((path, min(aggregate_ids), max(aggregate_ids)))
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+# ==============================================================================
+# 4. Snapshot Store
+#    - Periodic copies of an aggregate's state, so that loading it only has to
+#      replay the events recorded since the latest snapshot.
+# ==============================================================================
+
+SNAP_EVERY = 100
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """The serialized state of an aggregate as of a given version."""
+    aggregate_id: str
+    version: int
+    state: bytes
+
+class SnapshotStore:
+    """An in-memory store keeping the latest snapshot of each aggregate."""
+    def __init__(self):
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    def save(self, aggregate_id: str, version: int, state: bytes):
+        self._snapshots[aggregate_id] = Snapshot(aggregate_id, version, state)
+
+    def latest(self, aggregate_id: str) -> Optional[Snapshot]:
+        return self._snapshots.get(aggregate_id)
+
+def load_order(event_store: EventStore, snapshot_store: SnapshotStore, order_id: str) -> OrderAggregate:
+    """
+    Loads an order from its latest snapshot and the events since, taking a
+    new snapshot once SNAP_EVERY events have built up behind the last one.
+    """
+    snapshot = snapshot_store.latest(order_id)
+    if snapshot is None:
+        order = OrderAggregate.from_events(event_store.get_events_for_aggregate(order_id))
+        snapshot_version = 0
+    else:
+        # Nothing to fetch if no events have been appended since the snapshot.
+        if event_store.current_version(order_id) > snapshot.version:
+            events = event_store.get_events_for_aggregate(order_id, snapshot.version)
+        else:
+            events = []
+        order = OrderAggregate.from_snapshot_and_events(snapshot, events)
+        snapshot_version = snapshot.version
+    if order.version - snapshot_version >= SNAP_EVERY:
+        snapshot_store.save(order_id, order.version, order.snapshot_state())
+    return order
+
+def execute(
+    event_store: EventStore,
+    snapshot_store: SnapshotStore,
+    order: OrderAggregate,
+    command: Callable[[OrderAggregate], Event],
+) -> OrderAggregate:
+    """
+    Runs a command against an in-memory order, appends the resulting event
+    and applies it locally, so the order stays current without a rebuild.
+    If another writer got there first, the order is reloaded from the store
+    and the command retried once.
+    """
+    event = command(order)
+    try:
+        event_store.append_events(order.id, [event], expected_version=order.version)
+    except ConcurrencyError:
+        order = load_order(event_store, snapshot_store, order.id)
+        event = command(order)
+        event_store.append_events(order.id, [event], expected_version=order.version)
+    order._apply(event)
+    return order
 
 # ==============================================================================
 # Main Application Flow
@@ -182,59 +488,34 @@ class EventStore:
 def main():
     print("=== Starting Order Processing System ===")
     event_store = EventStore()
+    snapshot_store = SnapshotStore()
     order_id = str(uuid.uuid4())
 
     try:
         # Step 1: Create an order
         print(f"\nCreating a new order with ID: {order_id}")
-        order_to_create = OrderAggregate(order_id)
-        created_event = order_to_create.create_order(customer_name="Alice")
-        event_store.append_events(
-            aggregate_id=order_id,
-            events=[created_event],
-            expected_version=0
+        # The order is kept in memory from here on; each step applies the
+        # event it produced instead of rebuilding from the store.
+        order = execute(
+            event_store, snapshot_store, OrderAggregate(order_id),
+            lambda order: order.create_order(customer_name="Alice"),
         )
         print("Order created event successfully appended.")
 
         # Step 2: Add items to the order
         print(f"\nAdding items to order ID: {order_id}")
-        # Rebuild the aggregate from its events to get the current state.
-        events = event_store.get_events_for_aggregate(order_id)
-        order_to_update = OrderAggregate.from_events(events)
-        
-        item_event_1 = order_to_update.add_item("T-shirt", 2)
-        event_store.append_events(
-            aggregate_id=order_id,
-            events=[item_event_1],
-            expected_version=len(events)
-        )
-        
-        events = event_store.get_events_for_aggregate(order_id)
-        order_to_update = OrderAggregate.from_events(events)
-        item_event_2 = order_to_update.add_item("Jeans", 1)
-        event_store.append_events(
-            aggregate_id=order_id,
-            events=[item_event_2],
-            expected_version=len(events)
-        )
+        order = execute(event_store, snapshot_store, order, lambda order: order.add_item("T-shirt", 2))
+        order = execute(event_store, snapshot_store, order, lambda order: order.add_item("Jeans", 1))
         print("Items added events successfully appended.")
 
         # Step 3: Ship the order
         print(f"\nShipping order ID: {order_id}")
-        events = event_store.get_events_for_aggregate(order_id)
-        order_to_ship = OrderAggregate.from_events(events)
-        shipped_event = order_to_ship.ship_order()
-        event_store.append_events(
-            aggregate_id=order_id,
-            events=[shipped_event],
-            expected_version=len(events)
-        )
+        order = execute(event_store, snapshot_store, order, lambda order: order.ship_order())
         print("Order shipped event successfully appended.")
 
         # Step 4: Rebuild the final state to view it
         print(f"\nRebuilding final state for order ID: {order_id}")
-        final_events = event_store.get_events_for_aggregate(order_id)
-        final_order_state = OrderAggregate.from_events(final_events)
+        final_order_state = load_order(event_store, snapshot_store, order_id)
         
         print("\n=== Final Order State ===")
         print(f"ID: {final_order_state.id}")
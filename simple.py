@@ -6,28 +6,43 @@
 # 3. Event Store (append-only)
 # 4. Projection builders for read models
 
+from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Callable
+from enum import IntEnum
+from typing import List, Dict, Any, Callable, Optional
+import itertools
+import threading
+import time
 import uuid
-import datetime
 
 # ---------------- Event Schema -----------------
+# Event ids are snowflake-style ints: the creation time in nanoseconds with a
+# 20-bit counter in the low bits, so they stay unique and time-ordered
+# without going to the OS for randomness.
+_counter = itertools.count()
+
+class EvType(IntEnum):
+    OrderCreated = 0
+    ItemAdded = 1
+    OrderConfirmed = 2
+
 @dataclass
 class Event:
-    id: str
-    type: str
+    id: int
+    type: EvType
     aggregate_id: str
     data: Dict[str, Any]
-    timestamp: str
+    timestamp: int
 
     @staticmethod
-    def create(event_type: str, aggregate_id: str, data: Dict[str, Any]):
+    def create(event_type: EvType, aggregate_id: str, data: Dict[str, Any]):
+        timestamp = time.time_ns()
         return Event(
-            id=str(uuid.uuid4()),
+            id=(timestamp << 20) | (next(_counter) & 0xFFFFF),
             type=event_type,
             aggregate_id=aggregate_id,
             data=data,
-            timestamp=datetime.datetime.utcnow().isoformat()
+            timestamp=timestamp
         )
 
 # ---------------- Aggregate Root -----------------
@@ -37,39 +52,133 @@ class Order:
     status: str = "CREATED"
     items: List[Dict[str, Any]] = field(default_factory=list)
 
+    def _on_created(self, event: Event):
+        self.status = "CREATED"
+
+    def _on_item_added(self, event: Event):
+        self.items.append(event.data)
+
+    def _on_confirmed(self, event: Event):
+        self.status = "CONFIRMED"
+
+    _H = {
+        EvType.OrderCreated: _on_created,
+        EvType.ItemAdded: _on_item_added,
+        EvType.OrderConfirmed: _on_confirmed,
+    }
+
     def apply(self, event: Event):
-        if event.type == "OrderCreated":
-            self.status = "CREATED"
-        elif event.type == "ItemAdded":
-            self.items.append(event.data)
-        elif event.type == "OrderConfirmed":
-            self.status = "CONFIRMED"
+        self._H[event.type](self, event)
 
     def create(cls, order_id: str):
-        return Event.create("OrderCreated", order_id, {"order_id": order_id})
+        return Event.create(EvType.OrderCreated, order_id, {"order_id": order_id})
 
     def add_item(self, product_id: str, quantity: int):
-        return Event.create("ItemAdded", self.id, {"product_id": product_id, "quantity": quantity})
+        return Event.create(EvType.ItemAdded, self.id, {"product_id": product_id, "quantity": quantity})
 
     def confirm(self):
-        return Event.create("OrderConfirmed", self.id, {})
+        return Event.create(EvType.OrderConfirmed, self.id, {})
 
 # ---------------- Event Store -----------------
+# Appends go into a preallocated ring buffer; a single consumer thread drains
+# everything published since its last pass and hands it to each subscriber as
+# one batch, so writers only wait on subscribers when the ring is full. A
+# subscriber receives the events appended after it subscribed; if it raises,
+# delivery carries on and the error is re-raised by the next flush() or close().
+RING_SIZE = 1024
+
 class EventStore:
     def __init__(self):
         self.events: List[Event] = []
-        self.subscribers: List[Callable[[Event], None]] = []
+        self.subscribers: List[Callable[[List[Event]], None]] = []
+        # Producer cursor at the time each subscriber subscribed.
+        self._subscribed_at: List[int] = []
+        # Events per aggregate, so lookups don't scan the whole log.
+        self._index: Dict[str, List[Event]] = defaultdict(list)
+        self._ring: List[Event] = [None] * RING_SIZE
+        self._published = 0  # producer cursor
+        self._consumed = 0   # consumer cursor
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stopped = False  # set by the consumer thread on exit
+        self._error: Optional[Exception] = None
+        self._consumer = threading.Thread(target=self._drain, daemon=True)
+        self._consumer.start()
 
     def append(self, event: Event):
-        self.events.append(event)
-        for sub in self.subscribers:
-            sub(event)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("store is closed")
+            while self._published - self._consumed >= RING_SIZE:
+                self._cond.wait()
+                if self._closed:
+                    raise RuntimeError("store is closed")
+            self._ring[self._published % RING_SIZE] = event
+            self.events.append(event)
+            self._index[event.aggregate_id].append(event)
+            self._published += 1
+            self._cond.notify_all()
+
+    def _drain(self):
+        ring = self._ring
+        while True:
+            with self._cond:
+                while self._consumed == self._published and not self._closed:
+                    self._cond.wait()
+                start, end = self._consumed, self._published
+                if start == end:
+                    self._stopped = True
+                    self._cond.notify_all()
+                    return
+                subscribers = list(zip(self.subscribers, self._subscribed_at))
+            error = None
+            try:
+                # Slots in [start, end) are not reused until the consumer cursor
+                # moves past them, so they can be read without holding the lock.
+                batch = [ring[seq % RING_SIZE] for seq in range(start, end)]
+                for sub, since in subscribers:
+                    if since >= end:
+                        continue
+                    try:
+                        sub(batch if since <= start else batch[since - start:])
+                    except Exception as exc:
+                        error = error or exc
+            finally:
+                with self._cond:
+                    self._consumed = end
+                    if error is not None and self._error is None:
+                        self._error = error
+                    self._cond.notify_all()
+
+    def _raise_error(self):
+        # Called with self._cond held.
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    # Blocks until every appended event has reached the subscribers, or the
+    # consumer has shut down.
+    def flush(self):
+        with self._cond:
+            while self._consumed != self._published and not self._stopped:
+                self._cond.wait()
+            self._raise_error()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._consumer.join()
+        with self._cond:
+            self._raise_error()
 
     def get_by_aggregate(self, aggregate_id: str) -> List[Event]:
-        return [e for e in self.events if e.aggregate_id == aggregate_id]
+        return list(self._index.get(aggregate_id, ()))
 
-    def subscribe(self, handler: Callable[[Event], None]):
-        self.subscribers.append(handler)
+    def subscribe(self, handler: Callable[[List[Event]], None]):
+        with self._cond:
+            self.subscribers.append(handler)
+            self._subscribed_at.append(self._published)
 
 # ---------------- Projection Builders -----------------
 class OrderProjection:
@@ -77,29 +186,45 @@ class OrderProjection:
         self.orders: Dict[str, Dict[str, Any]] = {}
 
     def handle(self, event: Event):
-        if event.type == "OrderCreated":
-            self.orders[event.aggregate_id] = {"status": "CREATED", "items": []}
-        elif event.type == "ItemAdded":
-            self.orders[event.aggregate_id]["items"].append(event.data)
-        elif event.type == "OrderConfirmed":
-            self.orders[event.aggregate_id]["status"] = "CONFIRMED"
+        self.handle_batch((event,))
+
+    def handle_batch(self, events: List[Event]):
+        handlers = self._H
+        for event in events:
+            handlers[event.type](self, event)
+
+    def _on_created(self, event: Event):
+        self.orders[event.aggregate_id] = {"status": "CREATED", "items": []}
+
+    def _on_item_added(self, event: Event):
+        self.orders[event.aggregate_id]["items"].append(event.data)
+
+    def _on_confirmed(self, event: Event):
+        self.orders[event.aggregate_id]["status"] = "CONFIRMED"
+
+    _H = {
+        EvType.OrderCreated: _on_created,
+        EvType.ItemAdded: _on_item_added,
+        EvType.OrderConfirmed: _on_confirmed,
+    }
 
 # ---------------- Example Usage -----------------
 store = EventStore()
 projection = OrderProjection()
-store.subscribe(projection.handle)
+store.subscribe(projection.handle_batch)
 
 # Create an order
 order_id = str(uuid.uuid4())
-create_event = Event.create("OrderCreated", order_id, {"order_id": order_id})
+create_event = Event.create(EvType.OrderCreated, order_id, {"order_id": order_id})
 store.append(create_event)
 
 # Add items
-item_event = Event.create("ItemAdded", order_id, {"product_id": "P123", "quantity": 2})
+item_event = Event.create(EvType.ItemAdded, order_id, {"product_id": "P123", "quantity": 2})
 store.append(item_event)
 
 # Confirm order
-confirm_event = Event.create("OrderConfirmed", order_id, {})
+confirm_event = Event.create(EvType.OrderConfirmed, order_id, {})
 store.append(confirm_event)
 
+store.flush()
 print(projection.orders)
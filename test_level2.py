@@ -0,0 +1,126 @@
+import sys
+import threading
+
+import pytest
+
+from level2 import ConcurrencyError, EventStore, ItemAddedToOrder, OrderAggregate, OrderCreated
+
+THREADS = 8
+EVENTS_PER_THREAD = 200
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    """Switches threads far more often than the default, so races show up."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threads(target, count):
+    """Starts count threads on target(index) together and re-raises the first failure."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except BaseException as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def create(store, order_id):
+    store.append_events(order_id, [OrderCreated(order_id, 1, "Alice")], expected_version=0)
+
+
+def assert_gap_free(store, order_id, count):
+    events = store.get_events_for_aggregate(order_id)
+    assert [event.version for event in events] == list(range(1, count + 1))
+    assert store.current_version(order_id) == count
+
+
+def test_concurrent_writers_to_different_aggregates():
+    store = EventStore()
+
+    def write(index):
+        order_id = f"order-{index}"
+        create(store, order_id)
+        for version in range(2, EVENTS_PER_THREAD + 2):
+            event = ItemAddedToOrder(order_id, version, "T-shirt", 1)
+            store.append_events(order_id, [event], expected_version=version - 1)
+
+    run_threads(write, THREADS)
+
+    for index in range(THREADS):
+        order_id = f"order-{index}"
+        assert_gap_free(store, order_id, EVENTS_PER_THREAD + 1)
+        order = OrderAggregate.from_events(store.get_events_for_aggregate(order_id))
+        assert order.items == {"T-shirt": EVENTS_PER_THREAD}
+
+
+def test_concurrent_writers_to_same_aggregate():
+    store = EventStore()
+    order_id = "order-shared"
+    create(store, order_id)
+    conflicts = []
+
+    def write(index):
+        written = 0
+        while written < EVENTS_PER_THREAD:
+            version = store.current_version(order_id) + 1
+            event = ItemAddedToOrder(order_id, version, f"item-{index}", 1)
+            try:
+                store.append_events(order_id, [event], expected_version=version - 1)
+            except ConcurrencyError as exc:
+                conflicts.append(exc)
+            else:
+                written += 1
+
+    run_threads(write, THREADS)
+
+    assert_gap_free(store, order_id, THREADS * EVENTS_PER_THREAD + 1)
+    order = OrderAggregate.from_events(store.get_events_for_aggregate(order_id))
+    assert order.items == {f"item-{i}": EVENTS_PER_THREAD for i in range(THREADS)}
+    assert all(isinstance(exc, ConcurrencyError) for exc in conflicts)
+
+
+def test_conflicting_appends_at_same_version():
+    store = EventStore()
+    order_id = "order-race"
+    create(store, order_id)
+    outcomes = []
+
+    def write(index):
+        event = ItemAddedToOrder(order_id, 2, f"item-{index}", 1)
+        try:
+            store.append_events(order_id, [event], expected_version=1)
+        except ConcurrencyError:
+            outcomes.append("conflict")
+        else:
+            outcomes.append("ok")
+
+    run_threads(write, THREADS)
+
+    assert outcomes.count("ok") == 1
+    assert outcomes.count("conflict") == THREADS - 1
+    assert_gap_free(store, order_id, 2)
+
+
+def test_stale_expected_version_raises_concurrency_error():
+    store = EventStore()
+    create(store, "order-1")
+    store.append_events("order-1", [ItemAddedToOrder("order-1", 2, "Jeans", 1)], expected_version=1)
+
+    with pytest.raises(ConcurrencyError):
+        store.append_events("order-1", [ItemAddedToOrder("order-1", 2, "Jeans", 1)], expected_version=1)
+    assert_gap_free(store, "order-1", 2)